@@ -0,0 +1,206 @@
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+from cli import Color, style_str
+
+# SETTINGS
+admin_socket_file = 'trivia_admin.sock'     # UNIX-domain socket for the admin channel
+admin_port = 13118                          # Local TCP port for the admin channel, where UNIX-domain sockets are not supported
+admin_buffer_size = 4096                    # Max size of an admin command
+
+# Commands supported by the admin channel, see `AdminServer._execute()`
+admin_commands = {
+    'help': 'help - list the admin commands',
+    'get': 'get [setting] - show all settings, or a single one',
+    'set': 'set <setting> <value> - change a setting of the running server',
+    'clients': 'clients - list connected players and spectators, with their queue depth and RTT',
+    'kick': 'kick <name> - disconnect a player or a spectator',
+    'start': 'start - start the game without waiting for more players, while waiting for players',
+    'state': 'state - dump the game loop state',
+}
+
+
+class AdminServer:
+    """
+    A class representing a local admin channel for a running :class:`Server`.
+    Accepts one command per line and replies with a single line of JSON.
+    """
+    def __init__(self, server):
+        """
+        Initializes an admin channel for the given server.
+        :param server: The :class:`Server` to control.
+        """
+        self.server = server
+        self.socket = None
+
+    def start(self):
+        """
+        Opens the admin socket and starts accepting admin connections in a background thread.
+        """
+        if hasattr(socket, 'AF_UNIX'):
+            if os.path.exists(admin_socket_file):
+                os.remove(admin_socket_file)
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.bind(admin_socket_file)
+            os.chmod(admin_socket_file, 0o600)  # only the server's user may control it
+            address = admin_socket_file
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.bind(('127.0.0.1', admin_port))
+            address = f'127.0.0.1:{admin_port}'
+        self.socket.listen()
+        threading.Thread(target=self._accept_connections, daemon=True).start()
+        print(style_str('Admin channel listening on ', Color.YELLOW) + style_str(address, bold=True))
+
+    def _accept_connections(self):
+        """
+        Private method.
+        Accepts admin connections, each one is handled in its own thread.
+        """
+        while True:
+            try:
+                conn, _ = self.socket.accept()
+            except socket.error:
+                return
+            threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def _handle_connection(self, conn: socket):
+        """
+        Private method.
+        Executes the commands sent over an admin connection until it is closed.
+        :param conn: A socket connection to an admin.
+        """
+        buffer = ''
+        with conn:
+            try:
+                while True:
+                    data = conn.recv(admin_buffer_size)
+                    if data == b'':
+                        return
+                    buffer += data.decode()
+                    while '\n' in buffer:
+                        line, buffer = buffer.split('\n', 1)
+                        if line.strip() == '':
+                            continue
+                        conn.sendall((json.dumps(self._execute(line)) + '\n').encode())
+            except socket.error:
+                return
+
+    def _execute(self, line: str) -> dict:
+        """
+        Private method.
+        Executes a single admin command.
+        :param line: The command line, e.g. `set question_time 3`.
+        :return: The reply to send back to the admin.
+        """
+        command, *args = line.split()
+        try:
+            if command == 'help':
+                return {'commands': list(admin_commands.values())}
+            elif command == 'get':
+                settings = self.server.get_settings()
+                return settings if len(args) == 0 else {args[0]: settings[args[0]]}
+            elif command == 'set' and len(args) == 2:
+                self.server.set_setting(args[0], args[1])
+                print(style_str('Admin set ', Color.YELLOW) + style_str(args[0], bold=True) + style_str(' to ', Color.YELLOW) + style_str(args[1], bold=True))
+                return {args[0]: self.server.get_settings()[args[0]]}
+            elif command == 'clients':
+                return {'clients': self._clients_info()}
+            elif command == 'kick' and len(args) > 0:
+                kicked = self.server.kick(' '.join(args))
+                return {'kicked': kicked}
+            elif command == 'start':
+                if not self.server.force_start():
+                    return {'error': 'Not waiting for players'}
+                return {'start': True}
+            elif command == 'state':
+                return self.server.get_state()
+            return {'error': f'Unknown command: {line}'}
+        except KeyError as e:
+            return {'error': f'Unknown setting: {e.args[0]}'}
+        except (ValueError, AssertionError) as e:
+            return {'error': str(e)}
+
+    def _clients_info(self) -> list:
+        """
+        Private method.
+        Collects the queue depth and RTT of every connected player and spectator.
+        Players' RTT is measured by the server's pings, spectators' RTT is estimated by the kernel.
+        Players also get their average RTT and response time over all their recorded answers.
+        :return: A list of dictionaries, one for each connection.
+        """
+        connections = [(conn, name, False) for conn, name in self.server.clients.copy().items()]
+        connections += [(conn, name, True) for conn, name in self.server.spectators.spectators.copy().items()]
+        info = []
+        for conn, name, spectator in connections:
+            latency = self.server.latencies.get(conn)
+            measured = latency is not None and latency.samples > 0
+            data = None if spectator else self.server.players_data.data.get(name)
+            info.append({
+                'name': name,
+                'spectator': spectator,
+                'active': conn in self.server.active_players,
+                'queue_depth': get_queue_depth(conn),
+                'rtt': latency.rtt if measured else get_rtt(conn),
+                'clock_offset': latency.offset if measured else None,
+                'avg_rtt': data.avg_rtt() if data else None,
+                'avg_response_time': data.avg_response_time() if data else None,
+            })
+        return info
+
+
+def get_queue_depth(conn: socket):
+    """
+    Gets the number of bytes waiting in the send queue of a connection. Only supported on Linux.
+    :param conn: A socket connection.
+    :return: The number of unsent bytes, or None if unavailable.
+    """
+    try:
+        import fcntl
+        import termios
+        return struct.unpack('i', fcntl.ioctl(conn.fileno(), termios.TIOCOUTQ, b'\0' * 4))[0]
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def get_rtt(conn: socket):
+    """
+    Gets the round trip time of a TCP connection as estimated by the kernel. Only supported on Linux.
+    :param conn: A socket connection.
+    :return: The round trip time in seconds, or None if unavailable.
+    """
+    try:
+        tcp_info = conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+        return struct.unpack_from('I', tcp_info, 68)[0] / 1e6   # tcpi_rtt, in microseconds
+    except (AttributeError, OSError, struct.error):
+        return None
+
+
+def send_command(command: str) -> str:
+    """
+    Sends a single command to the admin channel of a local server.
+    :param command: The command to send.
+    :return: The reply of the server.
+    """
+    if hasattr(socket, 'AF_UNIX'):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(admin_socket_file)
+    else:
+        conn = socket.create_connection(('127.0.0.1', admin_port))
+    with conn:
+        conn.sendall((command + '\n').encode())
+        reply = b''
+        while not reply.endswith(b'\n'):
+            data = conn.recv(admin_buffer_size)
+            if data == b'':
+                break
+            reply += data
+    return reply.decode()
+
+
+if __name__ == '__main__':
+    print(send_command(' '.join(sys.argv[1:]) if len(sys.argv) > 1 else 'help'), end='')
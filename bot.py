@@ -1,6 +1,7 @@
 import string
 
 from client import Client, is_valid_port
+from transport import Transport
 import time
 import random
 
@@ -18,15 +19,16 @@ class Bot(Client):
     Bot client that generates random answers.
     """
 
-    def __init__(self, port: int, name: str = None):
+    def __init__(self, port: int, name: str = None, transport: Transport = None):
         """
         Initializes a bot client.
         :param name: The name of the bot.
         :param port: The port number to connect to.
+        :param transport: The :class:`Transport` to use. Defaults to the client's transport setting.
         """
         name = name_prefix + ' '
         name += random.choice(name_options) if not generate_name else ''.join(random.choices(string.ascii_letters + string.digits, k=generated_name_length))
-        super().__init__(name, port, False)
+        super().__init__(name, port, False, transport=transport)
 
     def input_listener(self):
         while True:
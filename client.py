@@ -3,15 +3,27 @@ import time
 import select
 import socket
 from cli import CLI, style_str, Color
+from transport import Transport, get_transport, transports
 import keyboard
 
 # SETTINGS
 client_name = 'Goku'
 client_port = 13117
+client_transport = 'tcp'    # 'tcp', or 'unix' for UNIX-domain sockets, has to match the server side. 'local' only works in the server's process
 use_cli = True              # Toggle between using CLI and console
 retry_time = 1              # Time to wait before retrying to listen for broadcasts after a failed connection
 max_packet_time = 10        # Oldest broadcast packet to accept, in seconds
 magic_number = 0xabcddcba   # Magic number for the broadcast packet, has to match the server side
+spectate_offer_type = 3     # Packet type of the offers for a game in progress, only spectators accept them, has to match the server side
+spectator_flag = 'spectate' # Handshake flag for read-only spectators, has to match the server side
+session_flag = 'session'    # Handshake flag for session tokens, has to match the server side
+goodbye_message = '/bye'    # Control message ending the session on purpose, e.g. game over or kicked, has to match the server side
+ping_message = '/ping'      # Control message asking for a pong, has to match the server side
+pong_message = '/pong'      # Control message answering a ping, has to match the server side
+players_request = '/players'    # Control message requesting a page of the players list, has to match the server side
+players_key = 'p'           # Key requesting the next page of the players list, also while out of the game or spectating
+reattach_time = 5           # Time to keep trying to reattach to the same server after the connection is lost
+reattach_interval = 0.5     # Time to wait between attempts to reattach
 
 # Key mapping for the client's input
 key_mapping = {
@@ -27,41 +39,50 @@ class Client:
     A Client class.
     """
 
-    def __init__(self, name: str, port: int, cli: bool = use_cli):
+    def __init__(self, name: str, port: int, cli: bool = use_cli, spectate: bool = False, transport: Transport = None):
         """
         Initializes a new client with a given name and port number.
         :param name: The name of the player.
         :param port: The port number to use.
         :param cli: :class:`CLI` object to use for the client. None uses console (default).
+        :param spectate: A boolean indicating whether to join games as a read-only spectator.
+        :param transport: The :class:`Transport` to discover and connect to servers with. Defaults to `client_transport`.
         """
         self.name = name
         self.port = port
-        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.tcp_socket = None
+        self.transport = transport if transport is not None else get_transport(client_transport)
+        self.spectate = spectate
+        self.session_token = None   # Given by the server, used to reattach to a game after the server restarts
+        self.spectating = spectate  # Also set by the server, when joining a game that already started
+        self.players_page = 0
+        self.tcp_socket = None  # Connection to the server, TCP or as provided by the transport
         self.response_needed = False
-        self.cli = CLI(lambda x: self.tcp_socket.send(x.encode())) if cli else None
+        self.cli = CLI(self._send_answer) if cli else None
 
-        if not cli:
+        if cli:
+            keyboard.add_hotkey(players_key, self.request_players)
+        else:
             self.input_thread = threading.Thread(target=self.input_listener)
             self.input_thread.start()
 
-        self.udp_socket.bind(('', self.port))
+        self.transport.start_discovery(self.port)
         self._print_to_screen(style_str(name, bold=True) + style_str(' client started', Color.YELLOW))
 
     def listen_for_broadcasts(self) -> 'tuple[str, int]':
         """
         Listens for game broadcasts over UDP and when found returns the address as tuple of `(IP, port)`.
+        Spectators also accept offers for games in progress.
         :return: The IP and port of the server to connect to.
         """
         self._print_to_screen(style_str('Listening for game offers...', Color.YELLOW))
         while True:
-            data, addr = self.udp_socket.recvfrom(1024)
+            data, ip = self.transport.receive_offer()
             data = data.decode().split(' ')  # {magic_number} {message_type} {server_name} {server_port} {packet_time}
             if data[0] != str(magic_number) or float(data[4]) + max_packet_time < time.time():
                 continue
-            if data[1] == '2':
-                self._print_to_screen(style_str('Received offer from server ', Color.YELLOW) + style_str(data[2], bold=True) + style_str(' at address ', Color.YELLOW) + style_str(addr[0], bold=True))
-                return addr[0], int(data[3])  # IP, port
+            if data[1] == '2' or (self.spectate and data[1] == str(spectate_offer_type)):
+                self._print_to_screen(style_str('Received offer from server ', Color.YELLOW) + style_str(data[2], bold=True) + style_str(' at address ', Color.YELLOW) + style_str(ip, bold=True))
+                return ip, int(data[3])  # IP, port
 
     def connect_server(self, ip: str, port: int) -> bool:
         """
@@ -70,14 +91,23 @@ class Client:
         :param port: The port number of the server.
         :return: True if connection was successful, False otherwise.
         """
-        self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._print_to_screen(style_str('Attempting to connect...', Color.YELLOW))
         try:
-            self.tcp_socket.connect((ip, port))
-            self.tcp_socket.send(self.name.encode())
+            self.tcp_socket = self.transport.connect(ip, port)
+            flags = f'\n{spectator_flag}' if self.spectate else ''
+            flags += f'\n{session_flag} {self.session_token}' if self.session_token else ''
+            self.tcp_socket.send((self.name + flags).encode())
             response = self.tcp_socket.recv(1024)
             if response:
+                _, *flags = response.decode().split('\n')   # {name}[\n{spectator_flag}][\n{session_flag} {token}\n{ping_message} {ping_id}]
+                self.spectating = spectator_flag in flags
+                self.session_token = next((flag.split(' ', 1)[1] for flag in flags if flag.startswith(session_flag + ' ')), None)
+                for flag in flags:
+                    if flag.startswith(ping_message + ' '):
+                        self._send_pong(flag)
                 self._print_to_screen(style_str('Connected successfully', Color.GREEN))
+                if self.spectating and not self.spectate:
+                    self._print_to_screen(style_str('The game already started, you are spectating', Color.YELLOW))
                 return True
             else:
                 self._print_to_screen(style_str('Connection failed', Color.RED))
@@ -89,6 +119,22 @@ class Client:
             self._print_to_screen(style_str('Connection timed out'), Color.RED)
             return False
 
+    def _send_pong(self, ping: str):
+        """
+        Answers a ping from the server right away, with the client's clock, so the server can measure the RTT.
+        :param ping: The ping message, `{ping_message} {ping_id}`.
+        """
+        ping_id = ping.split(' ', 1)[1]
+        self.tcp_socket.send(f'{pong_message} {ping_id} {time.time()}\n'.encode())
+
+    def _send_answer(self, answer: str):
+        """
+        Sends an answer to the server, unless spectating.
+        :param answer: The answer, '1' or '0'.
+        """
+        if not self.spectating:
+            self.tcp_socket.send(answer.encode())
+
     def _print_to_screen(self, message: str):
         """
         Prints to the screen using the correct method (CLI or console)
@@ -96,12 +142,23 @@ class Client:
         """
         self.cli.print_message(message) if self.cli else print(message)
 
+    def request_players(self):
+        """
+        Requests the next page of the players list from the server.
+        """
+        self.players_page += 1
+        try:
+            self.tcp_socket.send(f'{players_request} {self.players_page}\n'.encode())
+        except (AttributeError, socket.error):
+            pass
+
     def input_listener(self):
+        keyboard.add_hotkey(players_key, self.request_players)
         while True:
             try:
                 key = keyboard.read_key().lower()
                 if key in key_mapping and self.response_needed:
-                    self.tcp_socket.send(str(key_mapping[key]).encode())
+                    self._send_answer(str(key_mapping[key]))
                     self.response_needed = False
             except:
                 continue
@@ -126,8 +183,14 @@ class Client:
                         msg = buffer.pop(0)
                         if msg == '':
                             continue
+                        if msg.startswith(ping_message + ' '):
+                            self._send_pong(msg)
+                            continue
+                        if msg == goodbye_message:
+                            self.session_token = None   # closed on purpose, don't reattach
+                            continue
                         self._print_to_screen(msg)
-                        self.response_needed = True if not self.cli else False
+                        self.response_needed = True if not self.cli and not self.spectating else False
         except socket.error:
             return
 
@@ -144,12 +207,30 @@ class Client:
         Main function to run the client, connecting to a server and starting the game loop.
         """
         while True:
-            while True:
-                ip, port = self.listen_for_broadcasts()
-                if self.connect_server(ip, port):
-                    self.start_game()
-                    self.end_game()
-                time.sleep(retry_time)
+            ip, port = self.listen_for_broadcasts()
+            connected = self.connect_server(ip, port)
+            while connected:
+                self.start_game()
+                self.end_game()
+                connected = self._reattach(ip, port)
+            time.sleep(retry_time)
+
+    def _reattach(self, ip: str, port: int) -> bool:
+        """
+        Tries to reconnect to the same server with the session token, so a restarted server can resume the game.
+        Only done if the connection was lost, a server that ended the session on purpose sends `goodbye_message` first.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        :return: True if reconnected, False otherwise.
+        """
+        if self.session_token is None:
+            return False
+        deadline = time.time() + reattach_time
+        while time.time() < deadline:
+            time.sleep(reattach_interval)
+            if self.connect_server(ip, port):
+                return True
+        return False
 
 
 def is_valid_port(port: int) -> bool:
@@ -166,6 +247,8 @@ def validate_settings():
     Validates the settings of the client.
     """
     assert is_valid_port(client_port), 'Invalid port number'
+    assert client_transport in transports, 'Invalid client transport'
+    assert client_transport != 'local', 'The local transport only works with a server in the same process'
     assert client_name.replace(' ', '') != '', 'Invalid client name'
     assert retry_time >= 0, 'Invalid retry time'
     assert (i in [0, 1] for i in key_mapping.values()), 'Invalid key mapping'
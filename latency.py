@@ -0,0 +1,80 @@
+import time
+
+# SETTINGS
+ping_message = '/ping'      # Control message asking the client for a pong, has to match the client side
+pong_message = '/pong'      # Control message answering a ping, has to match the client side
+rtt_smoothing = 0.25        # Weight of each new sample in the smoothed RTT and clock offset
+max_compensation = 0.5      # Most RTT taken off a response time, so a client delaying its pongs can't gain more
+ping_timeout = 2            # Pongs arriving later than this are ignored, so they don't count as a huge RTT
+
+
+class Latency:
+    """
+    A class tracking the round trip time and clock offset of a connection, measured with ping/pong exchanges.
+    """
+    def __init__(self):
+        """
+        Initializes a latency tracker with no samples.
+        """
+        self.rtt = None         # Smoothed round trip time, in seconds
+        self.offset = None      # Smoothed client clock minus server clock, in seconds
+        self.samples = 0
+        self.sent_time = None   # Monotonic time the last ping was sent
+        self.timer_start = None # Monotonic time the last question was sent
+        self._ping_id = 0
+        self._pending = False
+
+    def ping(self) -> str:
+        """
+        Starts a new ping exchange. A pong for an older ping is ignored from now on.
+        :return: The ping message to send to the client.
+        """
+        self._ping_id += 1
+        self._pending = True
+        self.sent_time = time.monotonic()
+        return f'{ping_message} {self._ping_id}'
+
+    def start_timer(self):
+        """
+        Marks the start of the client's answer time, right before a question is sent.
+        Separate from the pings, so the client can't tell which pong its answer time depends on.
+        """
+        self.timer_start = time.monotonic()
+
+    def pong(self, ping_id: str, client_time: str, receive_time: float):
+        """
+        Updates the RTT and clock offset from the client's pong.
+        :param ping_id: The ID of the ping the client answered.
+        :param client_time: The client's wall clock time when it answered.
+        :param receive_time: The monotonic time the pong was received.
+        """
+        if not self._pending or ping_id != str(self._ping_id):
+            return
+        self._pending = False
+        rtt = receive_time - self.sent_time
+        if rtt > ping_timeout:
+            return
+        server_time = time.time() - (time.monotonic() - receive_time) - rtt / 2    # Server's wall clock when the client answered
+        offset = float(client_time) - server_time
+        if self.samples == 0:
+            self.rtt, self.offset = rtt, offset
+        else:
+            self.rtt += rtt_smoothing * (rtt - self.rtt)
+            self.offset += rtt_smoothing * (offset - self.offset)
+        self.samples += 1
+
+    def compensation(self) -> float:
+        """
+        Gets the time an answer spends on the network, which isn't counted in the client's response time.
+        Capped at `max_compensation`, since the client decides when to send its pongs.
+        :return: The compensation, in seconds.
+        """
+        return min(self.rtt or 0.0, max_compensation)
+
+    def response_time(self, receive_time: float) -> float:
+        """
+        Calculates how long the client took to answer the last question, without the time spent on the network.
+        :param receive_time: The monotonic time the answer was received.
+        :return: The response time, in seconds.
+        """
+        return max(0.0, receive_time - self.timer_start - self.compensation())
@@ -6,9 +6,28 @@ class Data:
         self.player = player
         self.questions = int(row[1])
         self.correct = int(row[2])
+        # Rows written before scoring and latency were recorded only have the first 3 columns
+        self.points = float(row[3]) if len(row) > 3 else float(self.correct)
+        self.timed = int(row[4]) if len(row) > 4 else 0                     # Answers with latency data
+        self.total_rtt = float(row[5]) if len(row) > 5 else 0.0             # In seconds
+        self.total_response_time = float(row[6]) if len(row) > 6 else 0.0  # In seconds, RTT compensated
+
+    def add(self, delta: list):
+        self.questions += delta[0]
+        self.correct += delta[1]
+        self.points += delta[2]
+        self.timed += delta[3]
+        self.total_rtt += delta[4]
+        self.total_response_time += delta[5]
+
+    def avg_rtt(self):
+        return self.total_rtt / self.timed if self.timed > 0 else None
+
+    def avg_response_time(self):
+        return self.total_response_time / self.timed if self.timed > 0 else None
 
     def to_write(self):
-        return [self.player, self.questions, self.correct]
+        return [self.player, self.questions, self.correct, round(self.points, 3), self.timed, round(self.total_rtt, 6), round(self.total_response_time, 6)]
 
     def __str__(self):
         return f'{self.player}: {self.questions} questions, {self.correct} correct'
@@ -18,17 +37,30 @@ class PlayersData:
     def __init__(self, file_name: str):
         self.file_name = file_name
         self.data = {}
+        self.deltas = {}    # player -> [questions, correct, points, timed, total_rtt, total_response_time] not yet written to the file
         self.load_data()
 
     def get_percentages(self):
         return {p: (self.data[p].correct / self.data[p].questions) * 100 for p in self.data}
 
-    def add_data(self, player: str, is_correct: bool):
-        if player in self.data:
-            self.data[player].questions += 1
-            self.data[player].correct += 1 if is_correct else 0
-        else:
-            self.data[player] = Data(player, [player, 1, 1 if is_correct else 0])
+    def get_points(self):
+        return {p: self.data[p].points for p in self.data}
+
+    def add_data(self, player: str, is_correct: bool, points: float = None, rtt: float = None, response_time: float = None):
+        if points is None:
+            points = 1 if is_correct else 0
+        timed = rtt is not None and response_time is not None
+        self.apply_deltas({player: [1, 1 if is_correct else 0, points, 1 if timed else 0, rtt if timed else 0, response_time if timed else 0]})
+
+    def apply_deltas(self, deltas: dict):
+        for player, delta in deltas.items():
+            delta = list(delta) + [0] * (6 - len(delta))    # Deltas saved before scoring and latency were recorded
+            if player not in self.data:
+                self.data[player] = Data(player, [player, 0, 0])
+            self.data[player].add(delta)
+            total = self.deltas.setdefault(player, [0] * 6)
+            for i in range(6):
+                total[i] += delta[i]
 
     def load_data(self):
         try:
@@ -46,6 +78,7 @@ class PlayersData:
                 writer = csv.writer(file)
                 for p in self.data.values():
                     writer.writerow(p.to_write())
+            self.deltas.clear()
         except:
             print('Error writing players data file')
 
@@ -1,17 +1,25 @@
+import ipaddress
+import math
 import os.path
 import re
+import secrets
 import socket
 import time
 import threading
-import subprocess
 
+from admin import AdminServer
 from cli import Color, style_str
+from latency import Latency, pong_message
 from trivia import Trivia
 from players_data import PlayersData
+from snapshot import GameSnapshot
+from spectator_feed import SpectatorFeed
+from transport import Transport, get_transport, get_interfaces, multicast_group, transports
 
 # SETTINGS
 server_name = 'Universe7'
 server_port = 13117
+server_transport = 'tcp'                # 'tcp', or 'unix' for UNIX-domain sockets. 'local' only works with clients in the server's process
 welcome_message = f'Welcome to the ' + style_str(server_name, bold=True) + ' server'
 questions_file = 'questions.csv'        # File containing the questions
 players_data_file = 'players_data.csv'  # File containing the players data, for statistics
@@ -21,72 +29,156 @@ minimum_players = 1                     # Minimum number of players required to
 broadcast_timeout = 1                   # Time to wait between game broadcasts
 tick_time = 1                           # Time between each server tick
 magic_number = 0xabcddcba               # Magic number for the broadcast packet, has to match the client side
+spectate_offer_type = 3                 # Packet type of the offers sent while a game is running, has to match the client side
+spectator_flag = 'spectate'             # Handshake flag for read-only spectators, has to match the client side
+session_flag = 'session'                # Handshake flag for session tokens, has to match the client side
+goodbye_message = '/bye'                # Control message ending a session on purpose, so the client doesn't reattach, has to match the client side
+snapshot_file = 'game_snapshot.json'    # File to checkpoint the game state to, for resuming after a restart
+snapshot_max_age = 60                   # Oldest snapshot to resume a game from, in seconds
+resume_wait_time = 3                    # Max time to wait for players to reattach to a resumed game
+handshake_timeout = 1                   # Time to wait for a new connection's handshake
+speed_scoring = False                   # Weight the points of correct answers by the RTT compensated response time
+control_pattern = r'/(\w+) ?([^\n]*)\n' # Control messages from clients, e.g. `/pong {ping_id} {client_time}\n`
+announcement_mode = 'full'              # 'full' names every player in announcements, 'compact' sends counts and personal statuses
+players_page_size = 20                  # Number of names in a page of the players list, and in the compact leaderboard
+players_request = '/players'            # Control message requesting a page of the players list, has to match the client side
+max_setting_value = 86400               # Largest value a setting can be changed to through the admin channel, e.g. a day for times
+
+# Settings that can be changed while the server is running, through the admin channel
+tunable_settings = {
+    'question_time': float,
+    'tick_time': float,
+    'players_wait_time': float,
+    'minimum_players': int,
+    'broadcast_timeout': float,
+    'speed_scoring': lambda value: parse_bool(value),
+}
 
 
 class Server:
     """
     A class representing a server for a trivia game.
     """
-    def __init__(self, ip: str, port: int, name: str):
+    def __init__(self, ip: str, port: int, name: str, transport: Transport = None):
         """
         Initializes a server with the given IP address, port number, and name.
         :param ip: The IP address of the server.
         :param port: The port number of the server.
         :param name: The name of the server.
+        :param transport: The :class:`Transport` to accept clients and send game offers with. Defaults to `server_transport`.
         """
         self.ip = ip
         self.port = port
         self.name = name
-        self.udp_socket = None  # UDP socket
-        self.tcp_socket = None  # TCP socket
+        self.transport = transport if transport is not None else get_transport(server_transport)
+        self.tcp_socket = None  # Listening socket, TCP or as provided by the transport
         self.last_connection_time = -1
         self.waiting_for_connections = False
+        self.start_event = threading.Event()   # Set to start the next game without waiting for more players
+        self.offers_stopped = threading.Event()
+        self.broadcast_thread = None
         self.clients = {}
+        self.sessions = {}      # conn -> session token
+        self.latencies = {}     # conn -> :class:`Latency`
+        self.spectators = SpectatorFeed(self._handle_spectator_message)
+        self.active_players = {}
+        self.responses = {}
+        self.response_times = {}
+        self.responses_lock = threading.Lock()
+        self.answered_event = threading.Event()    # Set once every active player answered the open question
+        self.question = None    # The open question, answers are only accepted while it is set
+        self.round_num = 0
         self.trivia = Trivia(questions_file)
         self.players_data = PlayersData(players_data_file)
+        self.snapshot = GameSnapshot.load(snapshot_file, snapshot_max_age)
+        self.restored_sessions = {}     # session token -> name, of players that haven't reattached yet
+        if self.snapshot is not None:
+            self.players_data.apply_deltas(self.snapshot.deltas)
+            self.restored_sessions = self.snapshot.players.copy()
         print(style_str(server_name, bold=True) + style_str(' server started', Color.YELLOW))
 
     def _broadcast(self):
         """
         Private method.
-        Continuously broadcasts a :class:`Packet` over UDP.
+        Continuously broadcasts a :class:`Packet` using the transport, e.g. over UDP, until the game ends.
+        Once the game starts, the packets are spectate-only offers, so spectators can find the game in progress.
         """
-        packet = Packet(self.name, self.port).encode()
-        broadcast_ip = '.'.join(self.ip.split('.')[:-1]) + '.255'
-        while self.waiting_for_connections:
-            self.udp_socket.sendto(packet, (broadcast_ip, self.port))
-            time.sleep(broadcast_timeout)
+        while True:
+            p_type = 2 if self.waiting_for_connections else spectate_offer_type
+            try:
+                self.transport.send_offer(Packet(self.name, self.port, p_type).encode())
+            except socket.error:
+                return
+            if self.offers_stopped.wait(broadcast_timeout):
+                return
 
     def _accept_connections(self):
         """
         Private method.
-        Accepts incoming connections from clients over TCP.
+        Accepts incoming connections from clients over TCP, until the TCP socket is closed.
+        Each handshake is handled in its own thread by `_handshake()`, so a silent connection can't hold up the others.
         """
-        self.tcp_socket.listen(1)  # listen for incoming connections
-        while self.waiting_for_connections:
+        while True:
             try:
                 conn, addr = self.tcp_socket.accept()
-                data = conn.recv(1024).decode()  # receive data from the client
-                print(style_str(data, bold=True) + style_str(' connected to the server', Color.YELLOW))
-                conn.send(f'{data}'.encode())   # send an arbitrary msg to verify connection
-                self.clients.update({conn: data})
-                self.last_connection_time = time.time()
             except socket.error:
                 return
+            threading.Thread(target=self._handshake, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn: socket):
+        """
+        Private method.
+        Receives the handshake of a new connection, and adds it as a player or a spectator.
+        Spectators, and players connecting after the game offer ended, join as spectators and are told so in the reply.
+        Players get a session token, which lets them reattach to the game if the server is restarted.
+        A connection that doesn't send its handshake within `handshake_timeout` is closed.
+        :param conn: A socket connection to a new client.
+        """
+        try:
+            conn.settimeout(handshake_timeout)
+            data = conn.recv(1024).decode()  # receive data from the client: {name}[\n{flag}]...
+            name, *flags = data.split('\n')
+            if spectator_flag in flags or not self.waiting_for_connections:
+                conn.send(f'{name}\n{spectator_flag}'.encode())   # tells late players they are only spectating
+                print(style_str(name, bold=True) + style_str(' is spectating', Color.YELLOW))
+                self.spectators.add(conn, name)
+                return
+            token = next((flag.split(' ', 1)[1] for flag in flags if flag.startswith(session_flag + ' ')), None)
+            if token in self.restored_sessions:
+                name = self.restored_sessions.pop(token)
+                print(style_str(name, bold=True) + style_str(' reattached to the server', Color.YELLOW))
+            else:
+                token = secrets.token_hex(8)
+                print(style_str(name, bold=True) + style_str(' connected to the server', Color.YELLOW))
+            latency = Latency()
+            conn.send(f'{name}\n{session_flag} {token}\n{latency.ping()}'.encode())
+            conn.settimeout(None)
+            self.latencies.update({conn: latency})
+            self.clients.update({conn: name})
+            self.sessions.update({conn: token})
+            self.last_connection_time = time.time()
+            threading.Thread(target=self._read_client, args=(conn,), daemon=True).start()    # also gets the handshake's pong
+            if self.snapshot is not None and all(token in self.sessions.values() for token in self.snapshot.active_players):
+                self.start_event.set()  # everyone is back, resume the game
+        except (socket.error, UnicodeDecodeError):
+            self.latencies.pop(conn, None)
+            conn.close()
 
     def broadcast_game_offer(self):
         """
         Broadcasts game offers using `_broadcast()`, and waits for clients to connect over TCP using `_accept_connections()`.
+        When resuming a game, waits up to `resume_wait_time` for its players to reattach instead.
         """
         # init sockets
-        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.tcp_socket.bind((self.ip, self.port))
+        self.transport.start_offers(self.ip, self.port)
+        self.tcp_socket = self.transport.listen(self.ip, self.port)
         self.waiting_for_connections = True
+        self.spectators.start()
 
-        # Start the broadcast thread
-        broadcast_thread = threading.Thread(target=self._broadcast)
-        broadcast_thread.start()
+        # Start the broadcast thread, it keeps sending spectate-only offers until the game ends
+        self.offers_stopped.clear()
+        self.broadcast_thread = threading.Thread(target=self._broadcast)
+        self.broadcast_thread.start()
 
         # Start the connections thread
         connection_thread = threading.Thread(target=self._accept_connections)
@@ -95,100 +187,282 @@ class Server:
         # Wait for clients to connect
         print(style_str('Broadcasting game offer on IP address ', Color.YELLOW) + style_str(self.ip, bold=True))
         self.last_connection_time = time.time()
-        while len(self.clients) < minimum_players:
-            time.sleep(time.time() - self.last_connection_time + players_wait_time)
+        if self.snapshot is not None:
+            self.start_event.wait(resume_wait_time)
+        while len(self.clients) < minimum_players and not self.start_event.is_set():
+            self.start_event.wait(time.time() - self.last_connection_time + players_wait_time)
+        self.start_event.clear()
         self.waiting_for_connections = False
-        self.udp_socket.close()
-        print(style_str('Done broadcasting, game will begin shortly...', Color.YELLOW))
+        print(style_str('Lobby closed, game will begin shortly...', Color.YELLOW))
 
-    def send_message(self, msg: str, print_msg=True):
+    def send_message(self, msg: str, print_msg=True, start_timers=False):
         """
-        Sends a message to all clients over TCP.
+        Sends a message to all clients and spectators over TCP. The message is encoded once for everyone.
         :param msg: A message to send.
         :param print_msg: A boolean indicating whether to print the message to the server's console.
+        :param start_timers: A boolean indicating whether to start the active players' answer time right before sending them the message.
         """
         msg += '\n'
+        data = msg.encode()
         for conn, name in self.clients.copy().items():
             try:
-                conn.send(msg.encode())
+                if start_timers and conn in self.active_players:
+                    self.latencies.setdefault(conn, Latency()).start_timer()
+                conn.send(data)
             except:
-                self.clients.pop(conn)
+                self.clients.pop(conn, None)   # may have been kicked already
                 conn.close()
                 print(style_str('Connection with ', Color.YELLOW) + style_str(name, bold=True) + style_str(' lost', Color.YELLOW))
+        self.spectators.publish(data)
         print(msg, end='') if print_msg else None
 
+    def send_private_message(self, connection: socket, msg: str):
+        """
+        Sends a message to a single client over TCP.
+        :param connection: A socket connection to the client.
+        :param msg: A message to send.
+        """
+        try:
+            connection.send((msg + '\n').encode())
+        except socket.error:
+            pass    # Lost connections are handled by `send_message()`
+
+    def _send_statuses(self, statuses: dict):
+        """
+        Sends each client its own status line, used by the 'compact' announcement mode instead of naming every player.
+        :param statuses: A dictionary of socket connections and their status messages.
+        """
+        for conn, msg in statuses.items():
+            self.send_private_message(conn, msg)
+
+    def _send_players_page(self, connection: socket, page: int):
+        """
+        Sends a page of the players still in the game to a client or a spectator that requested it.
+        :param connection: A socket connection to the client or the spectator.
+        :param page: The number of the page, starting from 1. Wraps around after the last page.
+        """
+        players = list(self.active_players.copy().values())
+        pages = max(1, math.ceil(len(players) / players_page_size))
+        page = (page - 1) % pages + 1
+        names = players[(page - 1) * players_page_size:page * players_page_size]
+        msg = f'Players ({page}/{pages}): ' + ', '.join(names)
+        if connection in self.spectators.spectators:
+            self.spectators.send(connection, (msg + '\n').encode())
+        else:
+            self.send_private_message(connection, msg)
+
     def _send_welcome_msg(self):
         """
         Sends a welcome message to all clients over TCP, using the `send_message()` method.
         """
         msg = f'\n{welcome_message}'
+        if announcement_mode == 'compact':
+            self.send_message(msg + f'\n{len(self.clients)} players joined')
+            return
         count = 1
         for player in self.clients.values():
             msg += f'\nPlayer {count}: {player}'
             count += 1
         self.send_message(msg)
 
-    def _handle_response(self, connection: socket, answer: bool):
+    def _receive(self, connection: socket, buffer: str = '') -> 'tuple[str, str, float]':
         """
-        Handles the response from a client, and sends a message to all clients indicating whether the answer was correct or not.
-        :param connection: A socket connection to a client to get the response from.
-        :param answer: The correct answer to the question.
+        Receives data from a client, and handles the control messages in it.
+        :param connection: A socket connection to a client.
+        :param buffer: Data left over from the previous call, e.g. a partial control message.
+        :return: A tuple of `(answers, buffer, receive_time)`, where `answers` are the answer characters received,
+            `buffer` is the data to pass to the next call, and `receive_time` is the monotonic time the data arrived.
+        """
+        data = connection.recv(1024)
+        receive_time = time.monotonic()
+        if data == b'':     # connection closed, e.g. kicked
+            raise ConnectionResetError
+        buffer += data.decode()
+        for command, args in re.findall(control_pattern, buffer):
+            self._handle_control_message(connection, command, args, receive_time)
+        answers, slash, pending = re.sub(control_pattern, '', buffer).partition('/')
+        return answers, slash + pending, receive_time
+
+    def _handle_control_message(self, connection: socket, command: str, args: str, receive_time: float):
+        """
+        Handles a control message from a client.
+        :param connection: A socket connection to the client.
+        :param command: The control message, without the leading `/`.
+        :param args: The arguments of the control message.
+        :param receive_time: The monotonic time the control message arrived.
+        """
+        if '/' + command == pong_message and connection in self.latencies:
+            ping_id, _, client_time = args.partition(' ')
+            try:
+                self.latencies[connection].pong(ping_id, client_time, receive_time)
+            except ValueError:
+                pass
+        elif '/' + command == players_request and args.isdigit():
+            self._send_players_page(connection, int(args))
+
+    def _handle_spectator_message(self, connection: socket, msg: str):
+        """
+        Handles a line sent by a spectator. Spectators can only send control messages, e.g. to request the players list.
+        :param connection: A socket connection to the spectator.
+        :param msg: The line, without the trailing newline.
+        """
+        for command, args in re.findall(control_pattern, msg + '\n'):
+            self._handle_control_message(connection, command, args, time.monotonic())
+
+    def _send_pings(self):
+        """
+        Pings every client between questions, the pongs update their RTT.
+        The pings aren't tied to the questions, so a client can't pick which RTT sample compensates its answer.
+        """
+        for conn in self.clients.copy():
+            self.send_private_message(conn, self.latencies.setdefault(conn, Latency()).ping())
+
+    def _score(self, is_correct: bool, response_time: float) -> float:
+        """
+        Calculates the points for an answer. With `speed_scoring`, a correct answer is worth between half a point
+        and a full point, depending on how fast it was given.
+        :param is_correct: A boolean indicating whether the answer was correct.
+        :param response_time: The RTT compensated response time, in seconds.
+        :return: The points for the answer.
         """
+        if not is_correct:
+            return 0
+        if not speed_scoring or response_time is None or question_time == 0:
+            return 1
+        return 0.5 + 0.5 * max(0.0, 1 - response_time / question_time)
+
+    def _read_client(self, connection: socket):
+        """
+        Private method.
+        Reads everything a player sends until the connection is closed, so that control messages are handled
+        and answers are timestamped as soon as they arrive. Answers are passed to `_handle_response()`.
+        :param connection: A socket connection to a player.
+        """
+        buffer = ''
         try:
-            data = connection.recv(1024)
-            response = data.decode()[-1] == '1'
-            if not self.stop_event.is_set():
-                self.responses[connection] = response
-                self.send_message(style_str(self.clients[connection], bold=True) + ' is ' + (style_str('correct', Color.GREEN) if response == answer else style_str('incorrect', Color.RED)))
-        except socket.error:
-            if connection in self.clients:
-                self.clients.pop(connection)
-                connection.close()
+            while True:
+                answers, buffer, receive_time = self._receive(connection, buffer)
+                if answers != '':
+                    self._handle_response(connection, answers[-1] == '1', receive_time)
+        except (socket.error, UnicodeDecodeError):
+            name = self.clients.pop(connection, None)   # None if kicked or the game ended
+            self.latencies.pop(connection, None)
+            connection.close()
+            if name is not None:
+                print(style_str('Connection with ', Color.YELLOW) + style_str(name, bold=True) + style_str(' lost', Color.YELLOW))
 
-    def _game_loop(self):
+    def _handle_response(self, connection: socket, response: bool, receive_time: float):
+        """
+        Handles the response from a client, and sends a message to all clients indicating whether the answer was correct or not.
+        Only the first answer of an active player to the open question counts, and its response time is compensated for the client's RTT.
+        An answer counts if its compensated response time is within `question_time`, even if it arrived after that.
+        :param connection: A socket connection to the client.
+        :param response: The client's answer.
+        :param receive_time: The monotonic time the answer arrived.
+        """
+        with self.responses_lock:
+            name = self.active_players.get(connection)  # None if the player is out of the game, or was kicked
+            if self.question is None or name is None or connection in self.responses:
+                return
+            latency = self.latencies.get(connection)
+            response_time = latency.response_time(receive_time) if latency else None
+            if response_time is not None and response_time > question_time:
+                return  # too late, even on the player's connection
+            self.response_times[connection] = response_time
+            self.responses[connection] = response
+            self._check_answered()
+            answer = self.question.answer
+        if announcement_mode == 'full':     # 'compact' sends a single result message for the round
+            self.send_message(style_str(name, bold=True) + ' is ' + (style_str('correct', Color.GREEN) if response == answer else style_str('incorrect', Color.RED)))
+
+    def _check_answered(self):
+        """
+        Private method, must be called while holding `responses_lock`.
+        Sets `answered_event` once every active player answered the open question.
+        Answers of players that were kicked meanwhile don't count towards it.
+        """
+        if self.question is not None and all(conn in self.responses for conn in self.active_players.copy()):
+            self.answered_event.set()
+
+    def _save_snapshot(self):
+        """
+        Checkpoints the game state to `snapshot_file`, so the game can be resumed if the server is restarted.
+        """
+        try:
+            GameSnapshot(
+                self.round_num,
+                list(self.trivia.questions),
+                {token: self.clients[conn] for conn, token in self.sessions.copy().items() if conn in self.clients},
+                [self.sessions[conn] for conn in self.active_players.copy() if conn in self.sessions],
+                self.players_data.deltas,
+            ).save(snapshot_file)
+        except OSError:
+            print(style_str('Failed to save game snapshot', Color.RED))
+
+    def _game_loop(self, round_num: int = 1, active_players: dict = None):
         """
         The main game loop, handles the game logic.
+        :param round_num: The round to start from, when resuming a game.
+        :param active_players: The players still in the game, when resuming a game. Defaults to all clients.
         """
-        self.active_players = self.clients.copy()
-        self.stop_event = threading.Event()
-        round_num = 1
+        self.active_players = self.clients.copy() if active_players is None else active_players
+        self.round_num = round_num
         while True:
+            self._save_snapshot()
+
             # Send the next question to all clients
             question = self.trivia.get_question()
-            players = ', '.join(self.active_players.values())
-            self.send_message(style_str(f'===== Round {round_num} =====', bold=True))
+            self.send_message(style_str(f'===== Round {self.round_num} =====', bold=True))
+            self._send_pings()
             time.sleep(tick_time)
-            self.send_message(f'Players: {players}')
+            if announcement_mode == 'compact':
+                self.send_message(f'Players: {len(self.active_players)} remaining')
+                self._send_statuses({conn: 'You are still in the game' if conn in self.active_players else 'You are out of the game' for conn in self.clients.copy()})
+            else:
+                players = ', '.join(self.active_players.values())
+                self.send_message(f'Players: {players}')
             time.sleep(tick_time)
-            self.send_message(question.question, True)
-
-            # Listen for clients responses
-            self.responses = {}
-            response_threads = []
-            self.stop_event.clear()
-            for conn, name in self.active_players.items():    # Start a thread for each client
-                responses_thread = threading.Thread(target=self._handle_response, args=(conn, question.answer))
-                responses_thread.start()
-                response_threads.append(responses_thread)
-            [thread.join(timeout=question_time) for thread in response_threads]
-            self.stop_event.set()   # Stop responses_thread
+
+            # Open the question before sending it, the players' readers timestamp the answers as they arrive
+            round_players = self.active_players.copy()  # names of this round's players, even if they are kicked
+            with self.responses_lock:
+                self.responses = {}
+                self.response_times = {}
+                self.question = question
+                self.answered_event.clear()
+            self.send_message(question.question, True, start_timers=True)
+            if len(round_players) > 0:  # All the players share the same time to answer, plus the time their answers spend on the network
+                latencies = [self.latencies.get(conn) for conn in round_players]
+                self.answered_event.wait(question_time + max(latency.compensation() if latency else 0.0 for latency in latencies))
+            with self.responses_lock:
+                self.question = None
 
             # Handle time-outs
-            if len(self.responses) < len(self.active_players):
+            timed_out = [conn for conn in self.active_players.copy() if conn not in self.responses]
+            if len(timed_out) > 0:
                 self.send_message('Time is up!')
                 time.sleep(tick_time)
-                for conn, player_name in self.active_players.copy().items():
-                    if conn not in self.responses:
+                for conn in timed_out:
+                    player_name = self.active_players.pop(conn, None)
+                    if announcement_mode == 'full' and player_name is not None:
                         self.send_message(style_str(player_name, bold=True) + ' did not answer in time')
-                        self.active_players.pop(conn)
                         time.sleep(tick_time)
 
             # Handle answers
             self.send_message('The correct answer is ' + style_str(str(question.answer), bold=True))
-            for conn, response in self.responses.items():
-                self.players_data.add_data(self.clients[conn], response == question.answer)     # Update players data
+            for conn, response in self.responses.copy().items():
+                latency = self.latencies.get(conn)
+                response_time = self.response_times.get(conn)
+                self.players_data.add_data(round_players[conn], response == question.answer, self._score(response == question.answer, response_time),
+                                           latency.rtt if latency else None, response_time)     # Update players data
                 if response != question.answer:
-                    self.active_players.pop(conn)
+                    self.active_players.pop(conn, None)
+            if announcement_mode == 'compact':
+                correct = sum(1 for response in self.responses.values() if response == question.answer)
+                self.send_message(f'{correct} correct, {len(self.responses) - correct} incorrect, {len(timed_out)} did not answer')
+                statuses = {conn: 'You are ' + (style_str('correct', Color.GREEN) if response == question.answer else style_str('incorrect', Color.RED)) for conn, response in self.responses.items()}
+                statuses.update({conn: 'You did not answer in time' for conn in timed_out})
+                self._send_statuses(statuses)
             time.sleep(tick_time)
 
             # Calculate % of correct answers
@@ -204,12 +478,15 @@ class Server:
                 elif len(self.active_players) == 1:
                     winner = list(self.active_players.values())[0]
                     self.send_message(style_str(winner, bold=True) + style_str(' is the winner!', Color.CYAN))
+                elif announcement_mode == 'compact':
+                    self.send_message(style_str(f'{len(self.active_players)} winners!', Color.CYAN))
+                    self._send_statuses({conn: style_str('You are a winner!', Color.CYAN) for conn in self.active_players})
                 else:
                     winners = ', '.join(style_str(winner, bold=True) for winner in self.active_players.values())
                     self.send_message(style_str(winners, bold=True) + style_str(' are the winners!', Color.CYAN))
                 time.sleep(tick_time)
                 return
-            round_num += 1
+            self.round_num += 1
             time.sleep(tick_time)
 
     def start_game(self):
@@ -221,38 +498,163 @@ class Server:
         self._game_loop()
         self.end_game()
 
+    def resume_game(self):
+        """
+        Resumes the game from the loaded snapshot, with the players that reattached to the server.
+        Players that connected for the first time join the resumed game as fresh players.
+        If none of the snapshot's active players reattached, the snapshot is dropped and a new game is started.
+        """
+        snapshot = self.snapshot
+        self.snapshot = None
+        self.restored_sessions.clear()
+        tokens = {conn: token for conn, token in self.sessions.copy().items() if conn in self.clients}
+        if not any(token in snapshot.active_players for token in tokens.values()):
+            print(style_str('No active players reattached, starting a new game', Color.YELLOW))
+            self.start_game()
+            return
+        self.trivia.load_questions()
+        self.trivia.restore_questions(snapshot.questions)
+        active_players = {conn: name for conn, name in self.clients.copy().items()
+                          if tokens.get(conn) in snapshot.active_players or tokens.get(conn) not in snapshot.players}
+        self.send_message(style_str('===== Game Resumed =====', bold=True))
+        time.sleep(tick_time)
+        self._game_loop(snapshot.round_num, active_players)
+        self.end_game()
+
     def _send_leaderboard(self):
         """
-        Sends the current scores to all clients.
+        Sends the current scores to all clients, as points with `speed_scoring` and as % of correct answers otherwise.
+        The 'compact' announcement mode only sends the top `players_page_size` scores.
         """
         self.send_message(style_str('===== Leaderboard =====', bold=True))
-        sorted_dict = dict(sorted(self.players_data.get_percentages().items(), key=lambda item: item[1], reverse=True))
+        scores, unit = (self.players_data.get_points(), ' points') if speed_scoring else (self.players_data.get_percentages(), '%')
+        sorted_dict = dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+        if announcement_mode == 'compact':
+            sorted_dict = dict(list(sorted_dict.items())[:players_page_size])
         for key, value in sorted_dict.items():
-            self.send_message(f'{key}: {round(value, 2)}%')
+            self.send_message(f'{key}: {round(value, 2)}{unit}')
             time.sleep(tick_time)
 
     def end_game(self):
         """
-        Ends the game. Closes the TCP connections and the socket.
+        Ends the game. Closes the TCP connections, including spectators, and the socket.
         """
         self._send_leaderboard()
         time.sleep(tick_time)
-        for conn in self.clients.copy():
+        clients = self.clients.copy()
+        self.clients.clear()
+        for conn in clients:
+            self.send_private_message(conn, goodbye_message)    # the game is over, don't reattach
+            try:
+                conn.shutdown(socket.SHUT_RDWR)     # wake up `_read_client()`
+            except socket.error:
+                pass
             conn.close()
-        self.tcp_socket.close()
+        self.transport.close_listener(self.tcp_socket)  # wakes up `_accept_connections()`
+        self.offers_stopped.set()
+        self.broadcast_thread.join()
+        self.transport.stop_offers()
+        self.spectators.close()
         self.clients.clear()
+        self.sessions.clear()
+        self.latencies.clear()
         self.active_players.clear()
         print(style_str('Game ended', Color.YELLOW))
         self.players_data.update_file()
+        GameSnapshot.delete(snapshot_file)
         time.sleep(tick_time)
 
+    def get_settings(self) -> dict:
+        """
+        Gets the settings that can be changed while the server is running.
+        :return: A dictionary of setting names and their current values.
+        """
+        return {name: globals()[name] for name in tunable_settings}
+
+    def set_setting(self, name: str, value: str):
+        """
+        Changes a setting while the server is running. The new value is used from the next time the setting is read.
+        Raises `ValueError` if the value is invalid, non-finite or larger than `max_setting_value`.
+        :param name: The name of the setting, one of `tunable_settings`.
+        :param value: The new value, as a string.
+        """
+        value = tunable_settings[name](value)
+        if not math.isfinite(value) or value > max_setting_value:
+            raise ValueError(f'{name} must be a number up to {max_setting_value}')
+        if value < 0:
+            raise ValueError(f'{name} cannot be negative')
+        if name == 'minimum_players' and value == 0:
+            raise ValueError('Minimum players must be greater than 0')
+        globals()[name] = value
+
+    def kick(self, name: str) -> int:
+        """
+        Disconnects all players and spectators with the given name.
+        Kicked players' sessions are revoked, so they don't reattach.
+        :param name: The name of the player or spectator.
+        :return: The number of connections closed.
+        """
+        kicked = 0
+        for conn, player in self.clients.copy().items():
+            if player == name:
+                self.clients.pop(conn, None)
+                self.sessions.pop(conn, None)
+                with self.responses_lock:
+                    self.active_players.pop(conn, None)     # an answer already given still counts
+                    self._check_answered()  # don't wait for the kicked player
+                self.latencies.pop(conn, None)
+                self.send_private_message(conn, style_str('You were kicked from the server', Color.RED))
+                self.send_private_message(conn, goodbye_message)
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)     # wake up `_read_client()`
+                except socket.error:
+                    pass
+                conn.close()
+                kicked += 1
+        for conn, spectator in self.spectators.spectators.copy().items():
+            if spectator == name:
+                self.spectators.remove(conn)
+                kicked += 1
+        if kicked > 0:
+            print(style_str(name, bold=True) + style_str(' was kicked', Color.YELLOW))
+        return kicked
+
+    def force_start(self) -> bool:
+        """
+        Starts the game as soon as possible, without waiting for `minimum_players` to connect.
+        Only possible while waiting for players, so that it can't skip the next game's lobby.
+        :return: True if the game is starting, False if no game is waiting for players.
+        """
+        if not self.waiting_for_connections:
+            return False
+        self.start_event.set()
+        return True
+
+    def get_state(self) -> dict:
+        """
+        Gets a snapshot of the game loop state, for introspection.
+        :return: A dictionary describing the state of the server.
+        """
+        return {
+            'waiting_for_connections': self.waiting_for_connections,
+            'round': self.round_num,
+            'resuming': self.snapshot is not None,
+            'clients': list(self.clients.copy().values()),
+            'active_players': list(self.active_players.copy().values()),
+            'responses': len(self.responses),
+            'spectators': len(self.spectators),
+            'questions_left': len(self.trivia.questions),
+            'settings': self.get_settings(),
+        }
+
     def run(self):
         """
-        Main method. Runs the server.
+        Main method. Runs the server, and its admin channel.
         """
+        AdminServer(self).start()
         while True:
             self.broadcast_game_offer()
-            self.start_game()
+            self.resume_game() if self.snapshot is not None else self.start_game()
             time.sleep(tick_time)
 
 
@@ -265,7 +667,7 @@ class Packet:
         Initializes a packet with the given server name, port, and type, and a magic number.
         :param server_name: The name of the server.
         :param server_port: The port number of the server.
-        :param p_type: The type of the packet. Defaults to 2 (game offer).
+        :param p_type: The type of the packet. Defaults to 2 (game offer), `spectate_offer_type` for a game in progress.
         """
         self.type = p_type
         self.server_name = server_name
@@ -279,18 +681,26 @@ class Packet:
         return f'{str(self.magic_number)} {str(self.type)} {self.server_name} {self.server_port} {str(time.time())}'.encode()
 
 
+def parse_bool(value: str) -> bool:
+    """
+    Parses a boolean setting strictly.
+    :param value: One of '1', 'true', 'on', '0', 'false' or 'off', in any case.
+    :return: The boolean value.
+    """
+    if value.lower() in ['1', 'true', 'on']:
+        return True
+    if value.lower() in ['0', 'false', 'off']:
+        return False
+    raise ValueError(f'Invalid boolean: {value}')
+
+
 def get_ip_address() -> str:
     """
-    Tries to get the IP address of the server automatically using `ipconfig`.
+    Tries to get the IP address of the server automatically using `get_interfaces()`.
     :return: The IP address of the server.
     """
     try:
-        ipconfig_output = subprocess.check_output("ipconfig", shell=True).decode()
-        ip_addresses = re.findall(r"IPv4 Address[. ]+: ([\d.]+)", ipconfig_output)
-        valid_ips = []
-        for ip_address in ip_addresses:
-            valid_ips.append(ip_address)
-
+        valid_ips = [str(interface.ip) for interface in get_interfaces() if not interface.ip.is_loopback]
         if len(valid_ips) == 0:
             raise Exception("Could not find IP address")
         elif len(valid_ips) == 1:
@@ -332,7 +742,9 @@ def validate_settings():
     Validates the settings of the server.
     """
     assert is_valid_port(server_port), 'Invalid server port number'
-    assert is_valid_ip(get_ip_address()), 'Invalid server IP address'
+    assert server_transport in transports, 'Invalid server transport'
+    assert server_transport != 'local', 'The local transport only works with clients in the same process'
+    assert server_transport != 'tcp' or is_valid_ip(get_ip_address()), 'Invalid server IP address'
     assert is_valid_port(server_port), 'Invalid server port number'
     assert server_name != '', 'Invalid server name'
     assert minimum_players > 0, 'Minimum players must be greater than 0'
@@ -340,10 +752,13 @@ def validate_settings():
     assert players_wait_time >= 0, 'Players wait time cannot be negative'
     assert question_time >= 0, 'Question time cannot be negative'
     assert os.path.isfile(questions_file), 'Questions file not found'
+    assert announcement_mode in ['full', 'compact'], 'Invalid announcement mode'
+    assert players_page_size > 0, 'Players page size must be greater than 0'
+    assert multicast_group is None or ipaddress.ip_address(multicast_group).is_multicast, 'Invalid multicast group'
 
 
 if __name__ == '__main__':
     validate_settings()
-    server_ip = get_ip_address()
+    server_ip = get_ip_address() if server_transport == 'tcp' else 'localhost'
     s1 = Server(server_ip, server_port, server_name)
     s1.run()
@@ -0,0 +1,68 @@
+import json
+import os
+import time
+
+
+class GameSnapshot:
+    """
+    A class representing a checkpoint of an in-progress game, used to resume the game after the server restarts.
+    """
+    def __init__(self, round_num: int, questions: list, players: dict, active_players: list, deltas: dict, snapshot_time: float = None):
+        """
+        Initializes a snapshot of the game state.
+        :param round_num: The number of the round about to be played.
+        :param questions: The IDs of the questions left in the deck.
+        :param players: The session tokens of the connected players, mapped to their names.
+        :param active_players: The session tokens of the players still in the game.
+        :param deltas: The players data not yet written to the players data file, see :class:`PlayersData`.
+        :param snapshot_time: The time the snapshot was taken. Defaults to now.
+        """
+        self.round_num = round_num
+        self.questions = questions
+        self.players = players
+        self.active_players = active_players
+        self.deltas = deltas
+        self.time = snapshot_time if snapshot_time is not None else time.time()
+
+    def save(self, file_name: str):
+        """
+        Writes the snapshot to a file. The file is replaced atomically, so a crash mid-write keeps the previous snapshot.
+        :param file_name: The name of the snapshot file.
+        """
+        data = {
+            'time': self.time,
+            'round': self.round_num,
+            'questions': self.questions,
+            'players': self.players,
+            'active': self.active_players,
+            'deltas': self.deltas,
+        }
+        with open(file_name + '.tmp', 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(file_name + '.tmp', file_name)
+
+    @staticmethod
+    def load(file_name: str, max_age: float):
+        """
+        Reads a snapshot from a file.
+        :param file_name: The name of the snapshot file.
+        :param max_age: The oldest snapshot to accept, in seconds.
+        :return: The :class:`GameSnapshot`, or None if there is no recent valid snapshot.
+        """
+        try:
+            with open(file_name, 'r') as file:
+                data = json.load(file)
+            if data['time'] + max_age < time.time():
+                return None
+            return GameSnapshot(data['round'], data['questions'], data['players'], data['active'], data['deltas'], data['time'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def delete(file_name: str):
+        """
+        Deletes the snapshot file, if it exists.
+        :param file_name: The name of the snapshot file.
+        """
+        if os.path.exists(file_name):
+            os.remove(file_name)
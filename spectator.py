@@ -0,0 +1,39 @@
+from client import Client, is_valid_port, players_key
+from transport import Transport
+import keyboard
+
+# SETTINGS
+port = 13117
+spectator_name = 'Whis'
+
+
+class Spectator(Client):
+    """
+    Read-only client that watches a game without playing.
+    """
+
+    def __init__(self, port: int, name: str = spectator_name, transport: Transport = None):
+        """
+        Initializes a spectator client.
+        :param port: The port number to connect to.
+        :param name: The name of the spectator.
+        :param transport: The :class:`Transport` to use. Defaults to the client's transport setting.
+        """
+        super().__init__(name, port, False, spectate=True, transport=transport)
+
+    def input_listener(self):
+        keyboard.add_hotkey(players_key, self.request_players)    # spectators can only ask for the players list
+
+
+def validate_settings():
+    """
+    Validates the settings of the spectator.
+    """
+    assert is_valid_port(port), 'Invalid port number'
+    assert spectator_name.replace(' ', '') != '', 'Invalid spectator name'
+
+
+if __name__ == '__main__':
+    validate_settings()
+    s1 = Spectator(port)
+    s1.run()
@@ -0,0 +1,202 @@
+import selectors
+import socket
+import threading
+import time
+
+# SETTINGS
+flush_timeout = 0.1     # Time to wait for a lagging spectator's socket to become writable, or a spectator's request
+max_request_size = 256  # Longest partial control line kept from a spectator, anything longer is dropped
+
+
+class SpectatorFeed:
+    """
+    A class that fans out the server's message stream to read-only spectators.
+    Each message is encoded once and the same buffer is shared by every spectator.
+    A spectator that falls behind is skipped forward to the latest message instead of queueing the ones it missed.
+    Lines sent by spectators, e.g. requests for the players list, are passed to a callback.
+    """
+    def __init__(self, on_message=None):
+        """
+        Initializes an empty spectator feed.
+        :param on_message: A function called with the connection and the line, for each line a spectator sends.
+        """
+        self.spectators = {}    # conn -> spectator name
+        self.on_message = on_message
+        self._current = {}      # conn -> (buffer, offset, replaceable) currently being written
+        self._next = {}         # conn -> latest buffer, written once the current one is done
+        self._private = {}      # conn -> messages for this spectator only, never dropped
+        self._received = {}     # conn -> partial line received from the spectator
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._running = False
+        self._writer_thread = None
+
+    def __len__(self):
+        return len(self.spectators)
+
+    def start(self):
+        """
+        Starts the writer thread that flushes lagging spectators and reads spectators' requests.
+        """
+        self._running = True
+        self._writer_thread = threading.Thread(target=self._writer, daemon=True)
+        self._writer_thread.start()
+
+    def add(self, conn: socket, name: str):
+        """
+        Adds a spectator to the feed. The connection is switched to non-blocking mode.
+        :param conn: A socket connection to the spectator.
+        :param name: The name of the spectator.
+        """
+        conn.setblocking(False)
+        with self._lock:
+            self.spectators[conn] = name
+            self._received[conn] = ''
+            self._selector.register(conn, selectors.EVENT_READ)
+
+    def remove(self, conn: socket):
+        """
+        Removes a spectator from the feed and closes its connection.
+        :param conn: A socket connection to the spectator.
+        """
+        with self._lock:
+            self._remove(conn)
+
+    def publish(self, data: bytes):
+        """
+        Sends an already encoded message to all spectators.
+        A spectator that hasn't started writing its previous message has it replaced by this one,
+        and a spectator in the middle of a message gets this one right after, dropping anything in between.
+        :param data: The encoded message.
+        """
+        with self._lock:
+            for conn in list(self.spectators):
+                if conn in self._current:
+                    buffer, offset, replaceable = self._current[conn]
+                    if offset == 0 and replaceable:
+                        self._current[conn] = (data, 0, True)
+                    else:
+                        self._next[conn] = data
+                    continue
+                self._current[conn] = (data, 0, True)
+                self._flush(conn)
+
+    def send(self, conn: socket, data: bytes):
+        """
+        Sends an already encoded message to a single spectator, e.g. a reply to its request.
+        Unlike published messages, it is written after the spectator's current message and never dropped.
+        :param conn: A socket connection to the spectator.
+        :param data: The encoded message.
+        """
+        with self._lock:
+            if conn not in self.spectators:
+                return
+            if conn in self._current:
+                self._private[conn] = self._private.get(conn, b'') + data
+                return
+            self._current[conn] = (data, 0, False)
+            self._flush(conn)
+
+    def close(self):
+        """
+        Stops the writer thread and closes all spectator connections.
+        """
+        self._running = False
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+            self._writer_thread = None
+        with self._lock:
+            for conn in list(self.spectators):
+                self._remove(conn)
+
+    def _flush(self, conn: socket):
+        """
+        Private method, must be called while holding the lock.
+        Writes as much of the spectator's pending data as the socket accepts without blocking.
+        :param conn: A socket connection to the spectator.
+        """
+        try:
+            while conn in self._current:
+                buffer, offset, replaceable = self._current[conn]
+                offset += conn.send(memoryview(buffer)[offset:])
+                if offset < len(buffer):
+                    self._current[conn] = (buffer, offset, replaceable)
+                    break
+                if conn in self._private:
+                    self._current[conn] = (self._private.pop(conn), 0, False)
+                elif conn in self._next:
+                    self._current[conn] = (self._next.pop(conn), 0, True)
+                else:
+                    self._current.pop(conn)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._remove(conn)
+            return
+
+        # Only lagging spectators are watched for writing by the writer thread
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if conn in self._current else 0)
+        if self._selector.get_key(conn).events != events:
+            self._selector.modify(conn, events)
+
+    def _read(self, conn: socket) -> list:
+        """
+        Private method, must be called while holding the lock.
+        Reads what a spectator sent without blocking, and removes the spectator if the connection was closed.
+        Only control lines are kept, anything before a `/` and partial lines longer than `max_request_size` are dropped.
+        :param conn: A socket connection to the spectator.
+        :return: A list of the complete lines received.
+        """
+        try:
+            data = conn.recv(1024)
+            if data == b'':
+                raise ConnectionResetError
+            *lines, partial = (self._received[conn] + data.decode()).split('\n')
+            partial = partial[partial.find('/'):] if '/' in partial else ''
+            self._received[conn] = partial if len(partial) <= max_request_size else ''
+            return lines
+        except BlockingIOError:
+            return []
+        except (OSError, UnicodeDecodeError):
+            self._remove(conn)
+            return []
+
+    def _writer(self):
+        """
+        Private method.
+        Continuously flushes spectators whose sockets were full when a message was published,
+        and passes the lines spectators send to `on_message`, outside the lock.
+        """
+        while self._running:
+            messages = []
+            with self._lock:
+                if len(self._selector.get_map()) == 0:
+                    ready = []
+                else:
+                    ready = self._selector.select(timeout=0)
+                for key, events in ready:
+                    conn = key.fileobj
+                    if events & selectors.EVENT_READ:
+                        messages += [(conn, line) for line in self._read(conn)]
+                    if events & selectors.EVENT_WRITE and conn in self.spectators:
+                        self._flush(conn)
+            for conn, line in messages:
+                if self.on_message is not None:
+                    self.on_message(conn, line)
+            if not ready:
+                time.sleep(flush_timeout)
+
+    def _remove(self, conn: socket):
+        """
+        Private method, must be called while holding the lock.
+        Forgets a spectator and closes its connection.
+        :param conn: A socket connection to the spectator.
+        """
+        if conn in self._selector.get_map():
+            self._selector.unregister(conn)
+        self.spectators.pop(conn, None)
+        self._current.pop(conn, None)
+        self._next.pop(conn, None)
+        self._private.pop(conn, None)
+        self._received.pop(conn, None)
+        conn.close()
@@ -0,0 +1,443 @@
+import abc
+import glob
+import ipaddress
+import os
+import queue
+import re
+import socket
+import subprocess
+import threading
+import time
+
+# SETTINGS
+multicast_group = None              # Optional multicast group to also send and listen for game offers on, e.g. '239.255.13.117'
+multicast_ttl = 1                   # Number of hops the multicast game offers may travel
+unix_socket_dir = '.'               # Directory for the UNIX-domain sockets and game offer files of the 'unix' transport
+discovery_interval = 0.1            # Time between checks for new game offers, for transports without broadcasts
+
+
+class Transport(abc.ABC):
+    """
+    A class representing how servers accept clients and advertise games, and how clients discover and connect to them.
+    Servers are addressed by `(ip, port)` on every transport, local transports only use the port.
+    Connections are stream sockets on every transport, so the game protocol is the same.
+    """
+    @abc.abstractmethod
+    def listen(self, ip: str, port: int) -> socket:
+        """
+        Opens a listening socket for game connections.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        :return: A socket to accept connections from.
+        """
+
+    @abc.abstractmethod
+    def connect(self, ip: str, port: int) -> socket:
+        """
+        Connects to a server. Raises `ConnectionRefusedError` if the server is not listening.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        :return: A socket connected to the server.
+        """
+
+    def close_listener(self, listen_socket: socket):
+        """
+        Closes a listening socket opened by `listen()`, waking up any thread waiting in `accept()`.
+        :param listen_socket: The listening socket.
+        """
+        try:
+            listen_socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        listen_socket.close()
+
+    def start_offers(self, ip: str, port: int):
+        """
+        Prepares to send game offers.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        """
+
+    @abc.abstractmethod
+    def send_offer(self, packet: bytes):
+        """
+        Sends a game offer to all listening clients.
+        :param packet: The encoded :class:`Packet`.
+        """
+
+    def stop_offers(self):
+        """
+        Stops sending game offers.
+        """
+
+    def start_discovery(self, port: int):
+        """
+        Prepares to receive game offers.
+        :param port: The port number game offers are sent to.
+        """
+
+    @abc.abstractmethod
+    def receive_offer(self) -> 'tuple[bytes, str]':
+        """
+        Waits for the next game offer.
+        :return: A tuple of the encoded :class:`Packet`, and the IP address of the server that sent it.
+        """
+
+
+class TCPTransport(Transport):
+    """
+    TCP connections, with game offers broadcast over UDP and optionally sent to `multicast_group`.
+    """
+    def __init__(self):
+        """
+        Initializes a TCP transport. The UDP sockets are opened by `start_offers()` and `start_discovery()`.
+        """
+        self.offer_socket = None
+        self.offer_destinations = []
+        self.discovery_socket = None
+
+    def listen(self, ip: str, port: int) -> socket:
+        """
+        Opens a TCP listening socket.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        :return: A TCP socket to accept connections from.
+        """
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # rebind while old games' connections linger
+        listen_socket.bind((ip, port))
+        listen_socket.listen()
+        return listen_socket
+
+    def connect(self, ip: str, port: int) -> socket:
+        """
+        Connects to a server over TCP.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        :return: A TCP socket connected to the server.
+        """
+        return socket.create_connection((ip, port))
+
+    def start_offers(self, ip: str, port: int):
+        """
+        Opens the UDP socket for game offers, and finds the broadcast addresses, and `multicast_group`, to send them to.
+        :param ip: The IP address of the server.
+        :param port: The port number of the server.
+        """
+        self.offer_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.offer_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if multicast_group:
+            self.offer_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicast_ttl)
+            self.offer_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(ip))
+        destinations = get_broadcast_addresses(ip) + ([multicast_group] if multicast_group else [])
+        self.offer_destinations = [(destination, port) for destination in destinations]
+
+    def send_offer(self, packet: bytes):
+        """
+        Sends a game offer to every broadcast address, and to `multicast_group` if set.
+        :param packet: The encoded :class:`Packet`.
+        """
+        for destination in self.offer_destinations:
+            self.offer_socket.sendto(packet, destination)
+
+    def stop_offers(self):
+        """
+        Closes the UDP socket for game offers.
+        """
+        self.offer_socket.close()
+
+    def start_discovery(self, port: int):
+        """
+        Opens a UDP socket on the shared discovery port, and joins `multicast_group` if set.
+        :param port: The port number game offers are sent to.
+        """
+        # Share the port, so that many clients and bots can listen for game offers on the same machine
+        self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.discovery_socket.bind(('', port))
+        if multicast_group:
+            membership = socket.inet_aton(multicast_group) + socket.inet_aton('0.0.0.0')
+            self.discovery_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+    def receive_offer(self) -> 'tuple[bytes, str]':
+        """
+        Waits for the next game offer on the UDP socket.
+        :return: A tuple of the encoded :class:`Packet`, and the IP address of the server that sent it.
+        """
+        data, addr = self.discovery_socket.recvfrom(1024)
+        return data, addr[0]
+
+
+class UnixTransport(Transport):
+    """
+    UNIX-domain socket connections, for clients on the same machine as the server.
+    Game offers are files in `unix_socket_dir`, next to the sockets.
+    """
+    def __init__(self):
+        """
+        Initializes a UNIX-domain transport, with no socket or offer file yet.
+        """
+        self.socket_path = None
+        self.offer_file = None
+        self.seen_offers = {}   # offer file -> modification time of the last offer read from it
+
+    def listen(self, ip: str, port: int) -> socket:
+        """
+        Opens a UNIX-domain listening socket at `get_unix_socket_path()`, replacing a stale socket file.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        :return: A UNIX-domain socket to accept connections from.
+        """
+        self.socket_path = get_unix_socket_path(port)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listen_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listen_socket.bind(self.socket_path)
+        listen_socket.listen()
+        return listen_socket
+
+    def close_listener(self, listen_socket: socket):
+        """
+        Closes the listening socket, and removes its socket file.
+        :param listen_socket: The listening socket.
+        """
+        super().close_listener(listen_socket)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def connect(self, ip: str, port: int) -> socket:
+        """
+        Connects to the UNIX-domain socket of a server. Raises `ConnectionRefusedError` if it doesn't exist.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        :return: A UNIX-domain socket connected to the server.
+        """
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(get_unix_socket_path(port))
+        except FileNotFoundError:
+            conn.close()
+            raise ConnectionRefusedError
+        return conn
+
+    def start_offers(self, ip: str, port: int):
+        """
+        Prepares the offer file of the server, `trivia-{port}.offer` in `unix_socket_dir`.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        """
+        self.offer_file = os.path.join(unix_socket_dir, f'trivia-{port}.offer')
+
+    def send_offer(self, packet: bytes):
+        """
+        Replaces the offer file atomically, so clients never read a partial offer.
+        :param packet: The encoded :class:`Packet`.
+        """
+        with open(self.offer_file + '.tmp', 'wb') as file:
+            file.write(packet)
+        os.replace(self.offer_file + '.tmp', self.offer_file)
+
+    def stop_offers(self):
+        """
+        Removes the offer file.
+        """
+        if os.path.exists(self.offer_file):
+            os.remove(self.offer_file)
+
+    def receive_offer(self) -> 'tuple[bytes, str]':
+        """
+        Polls `unix_socket_dir` every `discovery_interval` for an offer file that changed since it was last read.
+        :return: A tuple of the encoded :class:`Packet`, and the IP address of the server that sent it.
+        """
+        while True:
+            for offer_file in glob.glob(os.path.join(unix_socket_dir, 'trivia-*.offer')):
+                try:
+                    modified = os.path.getmtime(offer_file)
+                    if self.seen_offers.get(offer_file) == modified:
+                        continue
+                    with open(offer_file, 'rb') as file:
+                        data = file.read()
+                except OSError:
+                    continue    # The server stopped sending offers
+                self.seen_offers[offer_file] = modified
+                return data, 'localhost'
+            time.sleep(discovery_interval)
+
+
+class LocalTransport(Transport):
+    """
+    In-process connections over `socket.socketpair()`, for servers and clients running in the same process.
+    Game offers are passed through memory.
+    """
+    listeners = {}      # port -> queue of server side sockets waiting to be accepted
+    offers = {}         # port -> (offer number, latest game offer)
+    offers_changed = threading.Condition()
+
+    def __init__(self):
+        """
+        Initializes an in-process transport, with no offers seen yet.
+        """
+        self.port = None
+        self.seen_offers = {}   # port -> number of the last offer read from it
+
+    def listen(self, ip: str, port: int) -> socket:
+        """
+        Registers a :class:`LocalListener` for the port, in place of a listening socket.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        :return: The listener to accept connections from.
+        """
+        listener = LocalListener(port)
+        LocalTransport.listeners[port] = listener
+        return listener
+
+    def connect(self, ip: str, port: int) -> socket:
+        """
+        Connects to a server in the same process with a socket pair, queueing the server side on its listener.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        :return: The client side of the socket pair.
+        """
+        listener = LocalTransport.listeners.get(port)
+        if listener is None:
+            raise ConnectionRefusedError
+        client_socket, server_socket = socket.socketpair()
+        listener.pending.put(server_socket)
+        return client_socket
+
+    def start_offers(self, ip: str, port: int):
+        """
+        Remembers the port to publish game offers under.
+        :param ip: The IP address of the server. Unused.
+        :param port: The port number of the server.
+        """
+        self.port = port
+
+    def send_offer(self, packet: bytes):
+        """
+        Publishes a game offer in memory, and wakes up the clients waiting for offers.
+        :param packet: The encoded :class:`Packet`.
+        """
+        with LocalTransport.offers_changed:
+            number = LocalTransport.offers.get(self.port, (0, None))[0] + 1
+            LocalTransport.offers[self.port] = (number, packet)
+            LocalTransport.offers_changed.notify_all()
+
+    def stop_offers(self):
+        """
+        Removes the server's game offer from memory.
+        """
+        with LocalTransport.offers_changed:
+            LocalTransport.offers.pop(self.port, None)
+
+    def receive_offer(self) -> 'tuple[bytes, str]':
+        """
+        Waits for a game offer that wasn't read yet by this transport.
+        :return: A tuple of the encoded :class:`Packet`, and the IP address of the server that sent it.
+        """
+        with LocalTransport.offers_changed:
+            while True:
+                for port, (number, packet) in LocalTransport.offers.items():
+                    if self.seen_offers.get(port) != number:
+                        self.seen_offers[port] = number
+                        return packet, 'localhost'
+                LocalTransport.offers_changed.wait()
+
+
+class LocalListener:
+    """
+    A class representing the listening side of a :class:`LocalTransport`, with the parts of the socket API the server uses.
+    """
+    def __init__(self, port: int):
+        """
+        Initializes a listener with no pending connections.
+        :param port: The port number of the server.
+        """
+        self.port = port
+        self.pending = queue.Queue()
+
+    def accept(self) -> 'tuple[socket, str]':
+        """
+        Waits for a client to connect.
+        :return: A tuple of the server side socket, and the address of the client.
+        """
+        conn = self.pending.get()
+        if conn is None:
+            raise OSError('Listener closed')
+        return conn, 'localhost'
+
+    def shutdown(self, how: int):
+        """
+        Closes the listener, like a socket's `shutdown()` wakes up `accept()`.
+        :param how: Unused, the listener is always closed completely.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Unregisters the listener, and wakes up a thread waiting in `accept()`.
+        """
+        if LocalTransport.listeners.get(self.port) is self:
+            LocalTransport.listeners.pop(self.port)
+        self.pending.put(None)  # wake up `accept()`
+
+
+# Supported transports, by name
+transports = {
+    'tcp': TCPTransport,
+    'unix': UnixTransport,
+    'local': LocalTransport,
+}
+
+
+def get_transport(name: str) -> Transport:
+    """
+    Creates a transport by name.
+    :param name: The name of the transport, one of `transports`.
+    :return: A new :class:`Transport`.
+    """
+    return transports[name]()
+
+
+def get_unix_socket_path(port: int) -> str:
+    """
+    Gets the path of the UNIX-domain socket of a server.
+    :param port: The port number of the server.
+    :return: The path of the socket file.
+    """
+    return os.path.join(unix_socket_dir, f'trivia-{port}.sock')
+
+
+def get_interfaces() -> 'list[ipaddress.IPv4Interface]':
+    """
+    Gets the IPv4 address and netmask of each network interface, using `ipconfig` on Windows and `ip` elsewhere.
+    :return: A list of the network interfaces, including loopback.
+    """
+    if os.name == 'nt':
+        ipconfig_output = subprocess.check_output("ipconfig", shell=True).decode()
+        addresses = re.findall(r"IPv4 Address[. ]+: ([\d.]+).*\n\s*Subnet Mask[. ]+: ([\d.]+)", ipconfig_output)
+        return [ipaddress.IPv4Interface(f'{ip}/{mask}') for ip, mask in addresses]
+    ip_output = subprocess.check_output(['ip', '-o', '-f', 'inet', 'addr', 'show']).decode()
+    return [ipaddress.IPv4Interface(address) for address in re.findall(r"inet ([\d.]+/\d+)", ip_output)]
+
+
+def get_broadcast_addresses(ip: str) -> 'list[str]':
+    """
+    Gets the broadcast addresses to send game offers to, based on the netmask of the interface with the given IP address.
+    Falls back to the limited broadcast address if the interface can't be found.
+    :param ip: The IP address of the server, `0.0.0.0` means all interfaces.
+    :return: A list of broadcast addresses.
+    """
+    try:
+        interfaces = get_interfaces()
+    except (OSError, subprocess.CalledProcessError):
+        interfaces = []
+    if ip == '0.0.0.0':
+        interfaces = [interface for interface in interfaces if not interface.ip.is_loopback]
+    else:
+        interfaces = [interface for interface in interfaces if str(interface.ip) == ip]
+    if len(interfaces) == 0:
+        return ['255.255.255.255']
+    return sorted({str(interface.network.broadcast_address) for interface in interfaces})
@@ -31,6 +31,13 @@ class Trivia:
                 self.questions[qid] = Question(row[0], row[1] == 'TRUE')
                 qid += 1
 
+    def restore_questions(self, qids: list):
+        """
+        Keeps only the given questions, to restore the deck of a resumed game.
+        :param qids: The IDs of the questions to keep.
+        """
+        self.questions = {qid: self.questions[qid] for qid in qids if qid in self.questions}
+
     def get_question(self) -> Question:
         """
         Gets a random question from the questions list.